@@ -1,7 +1,7 @@
 """This is the main driver module for APA102 LEDs"""
-import Adafruit_GPIO as GPIO
-import Adafruit_GPIO.SPI as SPI
 from math import ceil
+from itertools import repeat
+from operator import add, and_, floordiv, lshift, mul, rshift
 
 RGB_MAP = {'rgb': [3, 2, 1], 'rbg': [3, 1, 2], 'grb': [2, 3, 1],
            'gbr': [2, 1, 3], 'brg': [1, 3, 2], 'bgr': [1, 2, 3]}
@@ -16,7 +16,9 @@ class APA102:
     Public methods are:
      - set_pixel
      - set_pixel_rgb
+     - set_buffer
      - show
+     - current
      - clear_strip
      - cleanup
 
@@ -71,12 +73,25 @@ class APA102:
     MAX_BRIGHTNESS = 31  # Safeguard: Max. brightness that can be selected.
     LED_START = 0b11100000  # Three "1" bits, followed by 5 brightness bits
     BUS_SPEED_HZ = 8000000  # SPI bus speed; If the strip flickers, lower this value
+    CHANNEL_MA = 20.0  # Estimated current of one color at full brightness
+    IDLE_MA = 1.0  # Estimated current of one LED that is off
+    BRIGHTNESS_MASK = bytes(range(32)) * 8  # Brightness byte -> 5 brightness bits
+    DITHER_HEADER = bytes(range(LED_START, LED_START + 32)) * 8  # 5 bits -> brightness byte
+    DITHER_DIVISOR = [257] + [257 * b for b in range(1, 32)]  # 5 bits -> 16 bit scale
 
     def __init__(self, num_led, global_brightness=MAX_BRIGHTNESS,
                  order='rgb', mosi=10, sclk=11, bus_speed_hz=BUS_SPEED_HZ,
-                 ce=None):
+                 ce=None, spi=None, max_current=None, dither=False):
         """Initializes the library.
-        
+
+        spi can be any object with write() and close() methods, to drive
+        the strip through something other than the Pi's GPIO pins.
+
+        max_current is the budget of the power supply in mA. When set, frames
+        estimated to draw more than that are dimmed on the way out (see show).
+
+        dither keeps 16 bits per color and sends them dithered over
+        successive frames (see dither_frame).
         """
         self.num_led = num_led  # The number of LEDs in the Strip
         order = order.lower()
@@ -89,6 +104,25 @@ class APA102:
 
         self.leds = [self.LED_START, 0, 0, 0] * self.num_led  # Pixel buffer
 
+        # Running sums of color value * 5 bit brightness, by position in the
+        # LED frame (index 0, the brightness byte itself, stays 0). Only kept
+        # when there is a budget to keep to.
+        self.max_current = max_current
+        self.load = [0, 0, 0, 0]
+
+        # 16 bit colors, three per LED in the order they are sent, and the
+        # part of each that is still owed to the LED from earlier frames
+        self.dither = dither
+        self.deep = [0] * (3 * self.num_led) if dither else None
+        self.residue = [128] * (3 * self.num_led) if dither else None
+
+        if spi is not None:
+            self.spi = spi
+            return
+
+        import Adafruit_GPIO as GPIO
+        import Adafruit_GPIO.SPI as SPI
+
         # MOSI 10 and SCLK 11 is hardware SPI, which needs to be set-up differently
         if mosi == 10 and sclk == 11:
             self.spi = SPI.SpiDev(0, 0 if ce is None else ce, bus_speed_hz)  # Bus 0
@@ -164,11 +198,22 @@ class APA102:
         # LED startframe is three "1" bits, followed by 5 brightness bits
         ledstart = (brightness & 0b00011111) | self.LED_START
 
+        if self.dither:
+            # Keep the fractions, the 8 bit buffer gets whole numbers
+            deep_index = 3 * led_num - 1
+            for position, value in zip(self.rgb, (red, green, blue)):
+                self.deep[deep_index + position] = int(value * 257 + 0.5)
+            red, green, blue = int(red), int(green), int(blue)
+
         start_index = 4 * led_num
+        if self.max_current is not None:
+            self.account(start_index, start_index + 4, -1)
         self.leds[start_index] = ledstart
         self.leds[start_index + self.rgb[0]] = red
         self.leds[start_index + self.rgb[1]] = green
         self.leds[start_index + self.rgb[2]] = blue
+        if self.max_current is not None:
+            self.account(start_index, start_index + 4, 1)
 
     def set_pixel_rgb(self, led_num, rgb_color, bright_percent=100):
         """Sets the color of one pixel in the LED stripe.
@@ -182,6 +227,64 @@ class APA102:
                        (rgb_color & 0x00FF00) >> 8, rgb_color & 0x0000FF,
                        bright_percent)
 
+    def set_buffer(self, leds, offset=0, deep=None, load=None):
+        """Copies ready made LED frames into the pixel buffer.
+
+        leds holds 4 bytes per LED exactly as they are sent to the strip:
+        the brightness byte, then the colors in the strip's order. Copying
+        starts at LED offset; whatever does not fit on the strip is dropped.
+
+        On a dithering strip, deep can carry the matching 16 bit colors
+        (3 per LED, in the same order). Without it they are made from leds.
+
+        When leds is a whole frame and the caller already knows its load
+        (see account), it can pass it as load instead of having it counted.
+        """
+        start = 4 * offset
+        end = min(len(self.leds), start + len(leds))
+        if end > start:
+            whole = start == 0 and end == len(self.leds)
+            if self.max_current is not None and not whole:
+                self.account(start, end, -1)
+            self.leds[start:end] = leds[:end - start]
+            if self.max_current is not None:
+                if whole and load is not None:
+                    self.load = list(load)
+                else:
+                    if whole:  # Counting the new frame once beats taking out the old
+                        self.load = [0, 0, 0, 0]
+                    self.account(start, end, 1)
+            if self.dither:
+                count = 3 * ((end - start) // 4)
+                if deep is None:
+                    frame = bytes(leds[:end - start])
+                    colors = bytearray(count)
+                    for i in range(3):
+                        colors[i::3] = frame[i + 1::4]
+                    deep = map(mul, colors, repeat(257))
+                self.deep[3 * offset:3 * offset + count] = list(deep)[:count]
+
+    def account(self, start, end, sign):
+        """Adds (sign 1) or removes (sign -1) the load of the LED frames
+        in self.leds[start:end] to or from the running sums.
+        """
+        if end - start == 4:  # The common case, a single pixel
+            brightness = self.leds[start] & 0b00011111
+            for i in range(1, 4):
+                self.load[i] += sign * brightness * self.leds[start + i]
+            return
+        brightness = bytes(self.leds[start:end:4]).translate(self.BRIGHTNESS_MASK)
+        for i in range(1, 4):
+            self.load[i] += sign * sum(map(mul, self.leds[start + i:end:4], brightness))
+
+    def current(self):
+        """Estimated current draw of the pixel buffer in mA.
+
+        Only known when the strip was created with a max_current.
+        """
+        full = self.CHANNEL_MA / (255 * self.MAX_BRIGHTNESS)
+        return self.num_led * self.IDLE_MA + sum(self.load) * full
+
     def rotate(self, positions=1):
         """ Rotate the LEDs by the specified number of positions.
 
@@ -191,6 +294,11 @@ class APA102:
         """
         cutoff = 4 * (positions % self.num_led)
         self.leds = self.leds[cutoff:] + self.leds[:cutoff]
+        # Moving pixels around doesn't change the load, so it stays as is
+        if self.dither:
+            cutoff = 3 * (positions % self.num_led)
+            self.deep = self.deep[cutoff:] + self.deep[:cutoff]
+            self.residue = self.residue[cutoff:] + self.residue[:cutoff]
 
     def show(self):
         """Sends the content of the pixel buffer to the strip.
@@ -200,9 +308,79 @@ class APA102:
         self.clock_start_frame()
         # xfer2 kills the list, unfortunately. So it must be copied first
         # SPI takes up to 4096 Integers. So we are fine for up to 1024 LEDs.
-        self.spi.write(list(self.leds))
+        if self.dither:
+            self.spi.write(self.dither_frame(self.budget()))
+        else:
+            self.spi.write(self.limit(list(self.leds)))
         self.clock_end_frame()
 
+    def dither_frame(self, factor=1.0):
+        """Turns the 16 bit colors into the next LED frame to send.
+
+        Each pixel is sent with the lowest 5 bit brightness its brightest
+        color still fits in at 8 bits, so dim colors use the whole 8 bits
+        instead of their bottom few. What is left below 8 bits is carried
+        over to the next frame, so that over a few frames the LED shows the
+        16 bit value on average. All of it is done with map() over builtins
+        on the whole strip at once.
+
+        factor dims the light before the brightness is picked (see budget),
+        so dim pixels get dimmer rather than being cut off.
+        """
+        n = self.num_led
+        brightness = bytes(self.leds[0::4]).translate(self.BRIGHTNESS_MASK)
+        spread = bytearray(3 * n)
+        for i in range(3):
+            spread[i::3] = brightness
+        # color * brightness: the light wanted, on a scale of 65535 * 31
+        light = map(mul, self.deep, spread)
+        if factor < 1.0:
+            light = map(floordiv, map(mul, light, repeat(int(factor * 1024))), repeat(1024))
+        light = list(light)
+        peak = map(max, light[0::3], light[1::3], light[2::3])
+        headers = bytes(map(floordiv, map(add, peak, repeat(65534)), repeat(65535)))
+        for i in range(3):
+            spread[i::3] = headers
+        # 8 bit colors at the new brightness, with 8 more bits of fraction
+        wanted = map(floordiv, map(lshift, light, repeat(8)),
+                     map(self.DITHER_DIVISOR.__getitem__, spread))
+        total = list(map(add, wanted, self.residue))
+        self.residue = list(map(and_, total, repeat(255)))
+        colors = bytes(map(rshift, total, repeat(8)))
+        frame = bytearray(4 * n)
+        frame[0::4] = headers.translate(self.DITHER_HEADER)
+        for i in range(3):
+            frame[i + 1::4] = colors[i::3]
+        return list(frame)
+
+    def limit(self, leds):
+        """Keeps a frame that is about to be sent within max_current.
+
+        If the frame is estimated to draw too much, the brightness bits of
+        every pixel are scaled down so that it doesn't. Only the copy being
+        sent is changed, the pixel buffer keeps the colors as set.
+        """
+        factor = self.budget()
+        if factor >= 1.0:
+            return leds
+        table = bytes((b & ~0b00011111) | int((b & 0b00011111) * factor)
+                      for b in range(256))
+        leds[0::4] = bytes(leds[0::4]).translate(table)
+        return leds
+
+    def budget(self):
+        """Factor the pixel buffer has to be dimmed by to stay within
+        max_current; 1.0 if it is within budget, or there is none.
+        """
+        if self.max_current is None:
+            return 1.0
+        idle = self.num_led * self.IDLE_MA
+        needed = self.current() - idle
+        budget = self.max_current - idle
+        if needed <= budget:
+            return 1.0
+        return max(budget, 0) / needed
+
     def cleanup(self):
         """Release the SPI device; Call this method at the end"""
 
@@ -232,3 +410,17 @@ class APA102:
         """For debug purposes: Dump the LED array onto the console."""
 
         print(self.leds)
+
+
+class NullSPI:
+    """Stand-in for the SPI device, for strips that are never sent anywhere.
+
+    Pass it as the spi argument of APA102 when only the pixel buffer is of
+    interest, e.g. when recording or compositing frames.
+    """
+
+    def write(self, data):
+        """Discards the data."""
+
+    def close(self):
+        """Nothing to release."""
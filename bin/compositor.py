@@ -0,0 +1,210 @@
+"""
+Compositor Class - stack the output of several effects onto one real strip.
+
+Each layer is a full APA102 pixel buffer that an effect (or Control) draws
+into exactly as it would into the strip. Showing a layer blends all visible
+layers bottom up into the real strip and shows that, so switching effects
+becomes a timed crossfade between two layers instead of a cut through black.
+
+Blending works on whole frames: colors are scaled with bytes.translate()
+through precomputed tables and the scaled frames are combined either as one
+big integer addition (alpha) or with map() over builtins (add, max). There
+is no per-pixel Python, so a transition costs about one extra frame render.
+"""
+
+import operator, threading, time
+import apa102
+
+MODES = ('alpha', 'add', 'max')
+FPS = 50
+""" Render rate while a fade is running. """
+
+SCALE = [None] * 256
+""" SCALE[a] maps a color byte v to v * a / 255, rounded. Built as needed. """
+
+SATURATE = bytes(range(256)) + b'\xff' * 255
+""" Maps the sum of two color bytes back into a byte. """
+
+def scale(frame, level):
+   """ Scale every byte of frame by level/255. """
+   if SCALE[level] is None:
+      SCALE[level] = bytes((v * level + 127) // 255 for v in range(256))
+   return frame.translate(SCALE[level])
+
+def blend(out, frame, level, mode):
+   """ Blend frame, at opacity level/255, over out. """
+   if mode == 'alpha':
+      # both scaled bytes add up to at most 255, so there are no carries
+      # between bytes and one integer addition blends the entire frame
+      total = (int.from_bytes(scale(out, 255 - level), 'big') +
+               int.from_bytes(scale(frame, level), 'big'))
+      return total.to_bytes(len(out), 'big')
+   frame = scale(frame, level)
+   if mode == 'add':
+      return bytes(map(SATURATE.__getitem__, map(operator.add, out, frame)))
+   return bytes(map(max, out, frame))
+
+class Layer(apa102.APA102):
+   """ Pixel buffer of one layer; it is drawn on like the strip itself. """
+
+   def opacity(self, now):
+      """ Opacity (0.0 to 1.0) at time now, following any running fade. """
+      if now >= self.end:
+         return self.target
+      return self.begin + (self.target - self.begin) * (now - self.start) / (self.end - self.start)
+
+   def fade(self, target, seconds):
+      """ Fade from the current opacity to target over seconds. """
+      now = time.monotonic()
+      self.begin = self.opacity(now)
+      self.target = target
+      self.start = now
+      self.end = now + seconds
+      return
+
+   def show(self):
+      """ Render the layers onto the strip - unless a fade is doing that,
+      or we are on our way out and the ticker or the next layer does it.
+      """
+      if not self.closing and not self.compositor.fading():
+         self.compositor.render()
+
+   def cleanup(self):
+      """ Layers don't own the SPI device, the strip does. """
+      return
+
+   def __init__(self, compositor, mode='alpha'):
+      """ Create a black, fully opaque layer the size of the compositor's strip. """
+      strip = compositor.strip
+      apa102.APA102.__init__(self, strip.num_led, strip.global_brightness,
+                             spi=apa102.NullSPI(), dither=strip.dither,
+                             max_current=strip.max_current)
+      self.rgb = strip.rgb
+      self.compositor = compositor
+      self.mode = mode if mode in MODES else 'alpha'
+      self.closing = False
+      self.on_close = None
+      self.begin = self.target = 1.0
+      self.start = self.end = 0.0
+
+class Compositor:
+   """ Owns the real strip and the stack of layers drawn on it. """
+
+   def layer(self, mode='alpha', fade=0.0):
+      """ Add a new top layer, fading it in from nothing over fade seconds. """
+      layer = Layer(self, mode)
+      with self.lock:
+         now = time.monotonic()
+         for below in self.layers:
+            if below.closing:
+               # a layer on its way out stays put while this one fades in
+               # over it, which makes a proper crossfade between the two
+               below.fade(below.opacity(now), 0)
+         if fade > 0:
+            layer.begin = layer.target = 0.0
+            layer.fade(1.0, fade)
+         self.layers.append(layer)
+      self.tick()
+      return layer
+
+   def remove(self, layer, fade=0.0, done=None):
+      """ Take a layer away, fading it out over fade seconds first.
+      done is called once the layer is gone.
+      """
+      with self.lock:
+         layer.closing = True
+         layer.on_close = done
+         if fade > 0 and layer in self.layers:
+            layer.fade(0.0, fade)
+            done = None
+         elif layer in self.layers:
+            self.layers.remove(layer)
+      if done is not None:
+         done()
+      self.tick()
+      return
+
+   def fading(self):
+      """ True while any layer is fading. """
+      now = time.monotonic()
+      return any(now < layer.end for layer in self.layers)
+
+   def render(self):
+      """ Blend the visible layers and show the result on the strip. """
+      closed = []
+      with self.lock:
+         now = time.monotonic()
+         levels = [int(round(255 * layer.opacity(now))) for layer in self.layers]
+
+         # anything under an opaque alpha layer can't be seen; closing
+         # layers that are covered up, or faded out, are done with
+         bottom = 0
+         for x, layer in enumerate(self.layers):
+            if layer.mode == 'alpha' and levels[x] == 255 and not layer.closing:
+               bottom = x
+         for x, layer in enumerate(self.layers):
+            if layer.closing and (x < bottom or levels[x] == 0):
+               closed.append(layer)
+         visible = [(layer, levels[x]) for x, layer in enumerate(self.layers)
+                    if x >= bottom and layer not in closed and levels[x] > 0]
+         self.layers = [layer for layer in self.layers if layer not in closed]
+
+         out = bytes(4 * self.strip.num_led)
+         deep = None
+         # the power estimate is kept per layer as it is drawn, so an
+         # uncovered layer brings its own; blended frames get counted once
+         load = [0, 0, 0, 0]
+         headers = bytes(self.strip.num_led)
+         for layer, level in visible:
+            frame = bytes(layer.leds)
+            if level == 255 and layer.mode == 'alpha':
+               out = frame
+               deep = layer.deep # for a dithering strip
+               load = layer.load
+            else:
+               out = blend(out, frame, level, layer.mode)
+            headers = bytes(map(max, headers, frame[0::4]))
+
+         if len(visible) > 1 or (visible and visible[0][1] < 255):
+            out = bytearray(out)
+            out[0::4] = headers # blending scaled the brightness bytes too
+            deep = None # and only the 8 bit colors were blended
+            load = None
+         elif not visible:
+            out = bytearray(out)
+            out[0::4] = bytes([self.strip.LED_START]) * self.strip.num_led
+         self.strip.set_buffer(out, deep=deep, load=load)
+         self.strip.show()
+
+      for layer in closed:
+         if layer.on_close is not None:
+            layer.on_close()
+      return
+
+   def tick(self):
+      """ Make sure fades get rendered, even when nothing else is drawing. """
+      with self.lock:
+         if self.ticker is not None or not self.fading():
+            return
+         self.ticker = threading.Thread(target=self.run, daemon=True)
+         self.ticker.start()
+      return
+
+   def run(self):
+      """ Ticker thread; renders at FPS for as long as something is fading. """
+      while True:
+         self.render()
+         with self.lock:
+            if not self.fading():
+               self.ticker = None
+               break
+         time.sleep(1.0 / FPS)
+      self.render() # settle on the final frame
+      return
+
+   def __init__(self, strip):
+      """ strip - the APA102 that actually gets shown. """
+      self.strip = strip
+      self.layers = []
+      self.ticker = None
+      self.lock = threading.RLock()
@@ -1,9 +1,12 @@
 #!/usr/bin/python3
 
-import configparser, socket, threading
-import simplejson as json
-import lib.mymqtt as mymqtt
-import apa102, effects, sys, time
+import time
+START = time.monotonic() # reference point for time to first frame
+
+# only what is needed to light the strip is imported up front; simplejson,
+# mymqtt and the effects are imported where they are first used
+import atexit, configparser, os, socket, threading
+import apa102, compositor, persist, registry, scenes, status, sys, timebase
 
 def clamp(n, smallest=0, largest=255):
    """ Clamp integer (n) values between a range - inclusive """
@@ -31,63 +34,121 @@ class Control:
       """ Sets all LEDs to a single color and renders it. """
       self.set_leds(None, self.red, self.green, self.blue)
       self.strip.show()
+      self.LEDS = [1] * self.NUM_LEDS # same as all_off, keep consistent state
       return
 
-   def set_leds(self, pixel, r=0, g=0, b=0, hex=None):
+   def set_leds(self, pixel, r=0, g=0, b=0, hex=None, strip=None):
       """ Set individual or all the LEDs - DOES NOT RENDER
    
             pixel - None => set all NUM_LEDS the same color
                   - List => set the LEDs in the list the same color
                   - int  => set individual pixel a color
+            strip - layer to draw on, our own if not given
       """
+      if strip is None:
+         strip = self.strip
+
+      if pixel is None:
+         pixel = range(self.NUM_LEDS)
+      elif type(pixel) is not list:
+         pixel = [pixel]
+
+      if hex is None and strip.dither:
+         # a dithering strip can show the fractions effects compute
+         color = [max(0.0, min(float(c), 255.0)) for c in (r, g, b)]
+         for x in pixel:
+            strip.set_pixel(x, *color, bright_percent=self.brightness)
+         return
+
       if hex is not None:
          hexcolor = hex
       else:
          hexcolor = rgbtohex(r,g,b)
 
-      if pixel is None:
-         for x in range(self.NUM_LEDS):
-            self.strip.set_pixel_rgb(x, hexcolor, self.brightness)
-      elif type(pixel) is list:
-         for x in pixel:
-            self.strip.set_pixel_rgb(x, hexcolor, self.brightness)
-      else:
-         self.strip.set_pixel_rgb(pixel, hexcolor, self.brightness)
+      for x in pixel:
+         strip.set_pixel_rgb(x, hexcolor, self.brightness)
       
       return
 
-   def stop_effect(self):
-      """ Stop the effect; signal the thread to exit, if running. """
-      # we always have 2 threads: main and stats, then any effects threads
-      if threading.active_count() > 2:
-         # stop current effect
-         self.done.set()
-         self.active.join()
-         self.done.clear()
+   def recall(self, name):
+      """ Show scene name, if there is one by that name, and render it. """
+      compiled = self.scenes.frame(name, self.strip, self.brightness)
+      if compiled is None:
+         return
+      frame, lit = compiled
+      self.strip.set_buffer(frame)
+      self.strip.show()
+      self.LEDS = list(lit)
+      self.state = 'ON' if any(lit) else 'OFF'
+      self.scene = name
+      return
+
+   def stop_effect(self, fade=None):
+      """ Stop the effect; signal the thread to exit, if running.
+
+            fade - seconds to fade the effect out over, self.fade if None.
+                   The thread keeps drawing until the fade is over, or
+                   until the next effect has faded in over it.
+      """
+      if self.active is None:
+         return
+      active, done, layer = self.active, self.done, self.layer
+      self.active = self.layer = None
+
+      fade = self.fade if fade is None else fade
+      if fade > 0 and active.is_alive():
+         self.mixer.remove(layer, fade, done.set)
+      else:
+         done.set()
+         active.join()
+         self.mixer.remove(layer)
       return
 
    def start_effect(self):
-      """ Start the effect thread. """
+      """ Start the effect thread, on its own layer. """
+      import effects
+
       # create our loop object
-      effect = effects.EffectLoop(disp=self)
+      self.done = threading.Event()
+      self.layer = self.mixer.layer(fade=self.fade)
+      effect = effects.EffectLoop(disp=self, strip=self.layer, sync=self.sync)
       self.active = threading.Thread(target=effect.loop, args=(self.done,))
       self.active.start() # kick our thread off
       return
 
    def on_message(self, client, message):
       """ Callback for MQTT messages. """
+      import simplejson as json
 
       params = json.loads(message.payload.decode('utf-8'))
-      status = {}
       pixel = None
 
+      ts = timebase.seconds(params.pop('ts', None))
+      if ts is not None:
+         self.timebase.calibrate(ts)
+      if not params:
+         return # just a sync ping, leave the running effect alone
+
+      if ('sync' in params):
+         self.sync = bool(params['sync'])
+
+      if ('scene' in params and 'define' in params):
+         try:
+            self.scenes.define(params['scene'], params['define'])
+         except ValueError:
+            pass # keep what we had
+         return # saving a scene leaves the display alone
+
       self.stop_effect() # stop any running effects
       self.effect = ''
+      self.scene = None
 
       if ('effect' in params):
          self.effect = params['effect']
+         self.args = registry.check(self.effect, params.get('args'), self.NUM_LEDS)
+         epoch = timebase.seconds(params.get('epoch'))
+         self.epoch = epoch if epoch is not None else self.timebase.epoch(ts)
          self.start_effect()
-         status['effect'] = self.effect
 
       if ('brightness' in params):
          self.brightness = clamp(int(params['brightness']), largest=31)
@@ -98,6 +159,9 @@ class Control:
          self.green = clamp(int(params['color']['g']))
          self.blue = clamp(int(params['color']['b']))
 
+      if ('scene' in params):
+         self.recall(params['scene'])
+
       if ('led' in params):
          pixel = int(params['led'])
 
@@ -128,38 +192,112 @@ class Control:
       # @TODO this is a hack for python3 to force render by calling it twice.
       self.strip.show()
 
-      # always report back our current state
-      status['brightness'] = self.brightness
-      status['color'] = {}
-      status['color']['r'] = self.red
-      status['color']['g'] = self.green
-      status['color']['b'] = self.blue
-      status['effect'] = self.effect
-      status['state'] = self.state
-
-      # Send the message back
-      client.update(status, fmt='json', retain=True)
+      # report back our current state; only what changed actually goes out
+      if self.publisher is not None:
+         self.publisher.update(brightness=self.brightness,
+                               color={'r': self.red, 'g': self.green, 'b': self.blue},
+                               effect=self.effect, args=self.args if self.effect else {},
+                               scene=self.scene, state=self.state)
+
+      # and remember it for the next boot
+      if self.store is not None:
+         self.store.save(self.snapshot())
       return
 
-   def __init__(self, leds):
-      """ Initialize all object vars. """
+   def snapshot(self):
+      """ Current state as a dict, for persisting. """
+      return {'brightness': self.brightness,
+              'color': {'r': self.red, 'g': self.green, 'b': self.blue},
+              'effect': self.effect,
+              'args': self.args,
+              'scene': self.scene,
+              'state': self.state,
+              'leds': list(self.LEDS)}
+
+   def restore(self, saved):
+      """ Re-apply a persisted state and render it. """
+      color = saved.get('color', {})
+      self.brightness = clamp(saved.get('brightness', self.brightness), largest=31)
+      self.red = clamp(color.get('r', self.red))
+      self.green = clamp(color.get('g', self.green))
+      self.blue = clamp(color.get('b', self.blue))
+      self.effect = saved.get('effect')
+      self.args = registry.check(self.effect, saved.get('args'), self.NUM_LEDS)
+      self.state = saved.get('state', 'OFF')
+
+      leds = saved.get('leds')
+      if type(leds) is list and len(leds) == self.NUM_LEDS:
+         self.LEDS = leds # ignore the map if NumLEDS changed since
+
+      if self.effect:
+         self.epoch = self.timebase.epoch()
+         self.start_effect()
+      elif saved.get('scene') in self.scenes.defs:
+         self.recall(saved['scene'])
+      elif self.state == 'ON' and any(self.LEDS) and not all(self.LEDS):
+         pixels = [i for i, e in enumerate(self.LEDS) if e]
+         self.set_leds(pixels, self.red, self.green, self.blue)
+         self.strip.show()
+      elif self.state == 'ON':
+         self.all_on()
+      else:
+         self.all_off()
+      return
+
+   def __init__(self, leds, store=None, sync=False, strip=None, sequences=None,
+                fade=0.0, max_current=None, presets=None, dither=False, spi=None):
+      """ Initialize all object vars.
+
+            store     - optional persist.StateStore to restore from and save to
+            sync      - run effects in lockstep with the rest of the fleet
+            strip     - APA102 to draw on, instead of the one on the GPIO pins
+            sequences - folder of recorded sequences, playable as effects
+            fade      - seconds to crossfade over when switching effects
+            max_current - power supply budget in mA, for the strip we create
+            presets   - scenes.Scenes to recall scenes from
+            dither    - dither 16 bit colors on the strip we create
+            spi       - transport for the strip we create, instead of the GPIO pins
+      """
 
       self.state = "OFF"
       self.effect = None
+      self.args = {} # checked keyword arguments for the effect
+      self.scene = None
+      self.publisher = None # status.StatusPublisher, set once connected
+      self.scenes = presets if presets is not None else scenes.Scenes()
       self.brightness = 15
       self.red = self.blue = self.green = 255
       self.NUM_LEDS = int(leds)
       self.done = threading.Event()
+      self.active = None # effect thread
+      self.layer = None # and the layer it draws on
+      self.fade = fade
       self.LEDS = [0] * self.NUM_LEDS
+      self.store = store
+      self.sync = sync
+      self.timebase = timebase.TimeBase()
+      self.epoch = 0.0 # shared start time of the current effect
+      self.sequences = sequences
 
       # init our smart strip
       # Blinkt! uses BCM 23 and 24 for data and clock
       # initial prototype used BCM 10 and 11 (defaults for APA lib)
-      self.strip = apa102.APA102(num_led=self.NUM_LEDS, 
-                                 global_brightness=self.brightness,
-                                 mosi = 23, sclk = 24,
-                                 order='rgb')
-      self.all_off()
+      if strip is None:
+         strip = apa102.APA102(num_led=self.NUM_LEDS,
+                               global_brightness=self.brightness,
+                               mosi = 23, sclk = 24,
+                               order='rgb', max_current=max_current,
+                               dither=dither, spi=spi)
+
+      # we draw on the bottom layer, effects get their own layers on top
+      self.mixer = compositor.Compositor(strip)
+      self.strip = self.mixer.layer()
+
+      saved = store.load() if store is not None else None
+      if saved is not None:
+         self.restore(saved)
+      else:
+         self.all_off()
       return
 
 def main():
@@ -194,14 +332,50 @@ def main():
    else:
       # load the device config
       config = configparser.ConfigParser()
-      config.read('../config/config.ini')
-
-      # initialization
-      client_id = socket.gethostname()
-
-      myDisp = Control(config[client_id]['NumLEDS']) # my display object
-
+      config.read(os.environ.get('LED_CONFIG', '../config/config.ini'))
+
+      # initialization; LED_HOST stands in for the host name, so that
+      # several controllers can run on one machine (see fleet.py)
+      client_id = os.environ.get('LED_HOST', socket.gethostname())
+      for key in ('mqttSet', 'mqttState', 'mqttId'):
+         if key in config['main']:
+            config['main'][key] = config['main'][key].replace('CID', client_id)
+
+      # restore and render the last state before anything else
+      store = persist.StateStore(config['main'].get('stateFile', '../config/state.json'))
+      atexit.register(store.flush)
+
+      import json # json is already loaded by persist, simplejson isn't yet
+      presets = scenes.Scenes(persist.StateStore(config['main'].get('sceneFile', '../config/scenes.json')))
+      atexit.register(presets.store.flush)
+      for section in config.sections():
+         if section.startswith('scene '):
+            presets.define(section[len('scene '):], json.loads(config[section]['runs']), save=False)
+
+      # a controller without a strip can log its frames instead
+      spi = None
+      if 'FrameLog' in config[client_id]:
+         import simulate
+         spi = simulate.LogSPI(config[client_id]['FrameLog'], int(config[client_id]['NumLEDS']))
+
+      myDisp = Control(config[client_id]['NumLEDS'], store,
+                       config[client_id].getboolean('sync', False),
+                       sequences=config['main'].get('sequenceDir', '../sequences'),
+                       fade=config['main'].getfloat('crossfade', 0.0),
+                       max_current=config[client_id].getfloat('MaxCurrent'),
+                       presets=presets, # my display object
+                       dither=config[client_id].getboolean('Dither', False),
+                       spi=spi)
+      print('first frame after {0:.1f} ms'.format((time.monotonic() - START) * 1000))
+
+      # give the network time to come up before talking to the broker
+      time.sleep(config['main'].getfloat('mqttDelay', 0))
+
+      import lib.mymqtt as mymqtt
       client = mymqtt.mymqtt(config, userdata=myDisp)
+      myDisp.publisher = status.StatusPublisher(client, config['main']['mqttState'],
+                                                config['main'].getfloat('statusInterval', 0.5),
+                                                config['main'].getboolean('statusDelta', False))
 
       # Wait forever for msgs
       client.loop_forever()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+"""
+Run several controllers side by side on one machine against a local MQTT
+broker, and check that synchronized effects stay in phase across them.
+
+Each controller is a real control-mqtt.py process, under its own name
+(LED_HOST) and with its own config file (LED_CONFIG): a copy of
+config.ini pointed at the broker, with crossfades off and state kept in
+a scratch folder. Instead of driving a strip each one logs the time and
+hash of every frame it sends. The effect is started on all of them with
+one synchronized message, after a few sync pings; afterwards every controller's frames are
+matched against the first one's, and the time between showing the same
+frame is reported.
+
+Usage:
+   fleet.py <count> [effect] [seconds] [broker]
+
+Defaults are the cylon effect for 10 seconds on localhost. Publishing
+needs mosquitto_pub. Exits with 1 if the frames don't match up, or are
+further apart than one effect step (TOLERANCE).
+"""
+
+import configparser, os, statistics, subprocess, sys, tempfile, time
+import timebase
+
+CONFIG = '../config/config.ini'
+TOLERANCE = 0.02
+""" Seconds two controllers may be apart showing the same frame. """
+
+def configure(folder, host, broker, num_led=24):
+   """ Write the config for controller host; returns its path. """
+   config = configparser.ConfigParser()
+   config.read(CONFIG)
+   config['main']['mqttServer'] = broker
+   config['main']['mqttDelay'] = '0'
+   config['main']['crossfade'] = '0' # crossfade frames depend on timing
+   config['main']['stateFile'] = os.path.join(folder, host + '.state.json')
+   config['main']['sceneFile'] = os.path.join(folder, host + '.scenes.json')
+   config[host] = {'NumLEDS': str(num_led), 'sync': 'yes',
+                   'FrameLog': os.path.join(folder, host + '.log')}
+   path = os.path.join(folder, host + '.ini')
+   with open(path, 'w') as f:
+      config.write(f)
+   return path
+
+def publish(broker, topic, payload):
+   """ Publish one message with mosquitto_pub. """
+   subprocess.check_call(['mosquitto_pub', '-h', broker, '-t', topic, '-m', payload])
+
+def frames(path, since):
+   """ First time each frame hash was logged at after since, from a frame log. """
+   seen = {}
+   with open(path) as f:
+      for line in f:
+         when, digest = line.split()
+         if float(when) >= since:
+            seen.setdefault(digest, float(when))
+   return seen
+
+def phase(reference, other):
+   """ Offsets in seconds of the frames other has in common with reference. """
+   return [other[digest] - when for digest, when in reference.items() if digest in other]
+
+def main():
+   """ Entry point. """
+   args = sys.argv[1:]
+   if not args:
+      print(__doc__)
+      return
+   count = int(args[0])
+   effect = args[1] if len(args) > 1 else 'cylon'
+   seconds = float(args[2]) if len(args) > 2 else 10.0
+   broker = args[3] if len(args) > 3 else 'localhost'
+
+   base = configparser.ConfigParser()
+   base.read(CONFIG)
+   folder = tempfile.mkdtemp(prefix='fleet-')
+   hosts = ['fleet{0}'.format(x) for x in range(count)]
+   processes = []
+   try:
+      for host in hosts:
+         env = dict(os.environ, LED_HOST=host, LED_CONFIG=configure(folder, host, broker))
+         processes.append(subprocess.Popen([sys.executable, 'control-mqtt.py'], env=env))
+      time.sleep(3) # let them all connect
+
+      # calibrate everyone's shared clock
+      for x in range(timebase.MIN_SAMPLES):
+         ping = '{{"ts": {0}}}'.format(round(time.time(), 3))
+         for host in hosts:
+            publish(broker, base['main']['mqttSet'].replace('CID', host), ping)
+         time.sleep(0.5)
+
+      # the same timestamp for everyone, so they agree on the epoch
+      ts = round(time.time(), 3)
+      payload = '{{"effect": "{0}", "sync": true, "ts": {1}}}'.format(effect, ts)
+      for host in hosts:
+         publish(broker, base['main']['mqttSet'].replace('CID', host), payload)
+      time.sleep(seconds)
+   finally:
+      for process in processes:
+         process.terminate()
+         process.wait()
+
+   # frames before the effect's shared start are each controller
+   # handling the message, whenever that reached it
+   since = ts + timebase.SYNC_LEAD - TOLERANCE
+   failed = False
+   reference = frames(os.path.join(folder, hosts[0] + '.log'), since)
+   print('{0}: {1} frames'.format(hosts[0], len(reference)))
+   for host in hosts[1:]:
+      offsets = phase(reference, frames(os.path.join(folder, host + '.log'), since))
+      if not offsets:
+         print('{0}: no frames in common'.format(host))
+         failed = True
+         continue
+      worst = max(offsets, key=abs)
+      print('{0}: {1} frames in common, median {2:+.1f} ms, worst {3:+.1f} ms'.format(
+            host, len(offsets), 1000 * statistics.median(offsets), 1000 * worst))
+      failed = failed or abs(worst) > TOLERANCE
+   print('logs in ' + folder)
+   sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+   main()
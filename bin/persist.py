@@ -0,0 +1,60 @@
+"""
+StateStore Class - keep the last applied display state in a small local file.
+
+The state is restored and rendered right after the strip is initialized, so
+the LEDs come back on after a reboot without waiting for the MQTT broker.
+Writes are batched: save() only queues the state, and a timer writes it out
+once things settle, so a burst of slider messages costs one write.
+"""
+
+import json, os, threading
+
+class StateStore:
+   """ Batched, atomic persistence of a small JSON state dict. """
+
+   def load(self):
+      """ Return the saved state dict, or None if there isn't a usable one. """
+      try:
+         with open(self.path) as f:
+            state = json.load(f)
+      except (OSError, ValueError):
+         return None
+      return state if isinstance(state, dict) else None
+
+   def save(self, state):
+      """ Queue state to be written. DOES NOT WRITE - the timer does. """
+      with self.lock:
+         self.pending = state
+         if self.timer is None:
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+      return
+
+   def flush(self):
+      """ Write any pending state to disk now. """
+      with self.lock:
+         if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+         state, self.pending = self.pending, None
+         if state is None:
+            return
+
+         # write a temp file and rename it, so a power cut never leaves
+         # us with a half written state file
+         tmp = self.path + '.tmp'
+         with open(tmp, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+         os.replace(tmp, self.path)
+      return
+
+   def __init__(self, path, delay=2.0):
+      """ path - state file, delay - seconds to batch writes for. """
+      self.path = path
+      self.delay = delay
+      self.pending = None
+      self.timer = None
+      self.lock = threading.Lock()
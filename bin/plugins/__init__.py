@@ -0,0 +1,6 @@
+"""
+Effect plugins, imported by the registry as they are needed.
+
+Effects are plain functions taking the running effects.EffectLoop as their
+first argument; see registry.py for their parameters.
+"""
@@ -0,0 +1,74 @@
+""" Bouncing balls. """
+
+import math
+
+def bouncing(loop, rand=False, balls=4, delay=0.05):
+   """ Bouncing Balls. Not happy with this implementation. """
+   gravity = -9.8/2.0 # yes, gravity
+
+   # map colors to each ball
+   colors = [[0 for x in range(3)] for y in range(balls)]
+   if not rand:
+      for i in range(balls):
+         colors[i][0] = loop.disp.red
+         colors[i][1] = loop.disp.green
+         colors[i][2] = loop.disp.blue
+   else:
+      for i in range(balls):
+         colors[i][0] = loop.random.randint(0, 255)
+         colors[i][1] = loop.random.randint(0, 255)
+         colors[i][2] = loop.random.randint(0, 255)
+
+   # arrays to track ball information
+   height = [0 for x in range(balls)]
+   velocity = [0.0 for x in range(balls)]
+   tDelta = [0 for x in range(balls)]
+   position = [0 for x in range(balls)]
+   clockDelta = [0.0 for x in range(balls)]
+   dampening = [0.0 for x in range(balls)]
+
+   # initialize each array
+   for i in range(balls):
+     clockDelta[i] = loop.millis() # start time
+     height[i] = loop.disp.NUM_LEDS - (2 * i)
+     position[i] = 0
+     velocity[i] = 0
+     tDelta[i] = 0
+     # adjust dampening for each ball, so they look different
+     dampening[i] = -0.90 - float(i)/math.pow(balls, 2)
+
+   while True:
+      for i in range(balls):
+         tDelta[i] =  loop.millis() - clockDelta[i]
+         # calc ending velocity
+         velocity[i] = velocity[i] + (gravity * tDelta[i]/1000)
+         # calc how far it fell x = x + vdT
+         prevHeight = height[i]
+         height[i] = prevHeight + (velocity[i] * tDelta[i]/1000)
+
+         # handle hitting bottom
+         if height[i] < 0:
+            height[i] = 0
+            velocity[i] = dampening[i] * velocity[i]
+            clockDelta[i] = loop.millis() # mark time it hit bottom
+            # and if velocity gets too low, crank it back up
+            if velocity[i] < 0.01:
+               velocity[i] = 2
+            # if we stop bouncing, restart it
+            if int(height[i]) == int(prevHeight):
+               height[i] = loop.disp.NUM_LEDS
+               velocity[i] = 0
+
+         # @TODO - this position needs work
+         # position[i] = int(round(height[i] / 4 * (loop.disp.NUM_LEDS-1)))
+         position[i] = int(height[i])
+         # original code below
+         # position[i] = int(round(height[i] * (loop.disp.NUM_LEDS-1) / initialHeight))
+
+      for i in range(balls):
+         loop.set_leds(position[i], colors[i][0], colors[i][1], colors[i][2])
+
+      loop.strip.show()
+      loop.all_off() # immediately clear the strip
+      loop.exitIfDone()
+      loop.wait(delay)
@@ -0,0 +1,32 @@
+""" Fading effects. """
+
+def fadeInOut(loop, r, g, b, leds=None, steps=128, fadeDelay=0.01, loopDelay=0.1):
+   """ Pulse/Fade-In-Out effect """
+   while True:
+      loop.fadeIn(r, g, b, leds, steps, fadeDelay)
+      loop.exitIfDone()
+      loop.fadeOut(r, g, b, leds, steps, fadeDelay)
+      loop.exitIfDone()
+      loop.wait(loopDelay)
+
+def halloweenEyes(loop, r, g, b, eyeWidth=1, eyeSpace=4, fade=True,
+                  steps=50, fadeDelay=0.01, loopDelay=0.1):
+   """ Create random pair of eyes based on parameters given. """
+   while True:
+      eyeOne = loop.random.randint(0, max(0, loop.disp.NUM_LEDS - (2*eyeWidth) - eyeSpace))
+      eyeTwo = eyeOne + eyeWidth + eyeSpace
+
+      pixels = []
+      for x in range(eyeWidth):
+         pixels.append(eyeOne + x)
+         pixels.append(eyeTwo + x)
+
+      loop.set_leds(pixels, r, g, b)
+      loop.strip.show()
+
+      if fade:
+         loop.fadeOut(r, g, b, pixels, steps, fadeDelay)
+
+      loop.all_off()
+      loop.exitIfDone()
+      loop.wait(loopDelay)
@@ -0,0 +1,54 @@
+""" Fire effect. """
+
+def _set_pixel_heat_color(loop, pixel, temp):
+   """ Helper for fire effect. """
+   # Scale 'heat' down from 0-255 to 0-191
+   scaled = (temp/255.0)*191
+   temp = int(round(scaled))
+
+   # calculate ramp up from
+   heatramp = temp & 0x3F # 0..63
+   heatramp = heatramp << 2 # scale up to 0..252
+   if temp < 0x40 and loop.strip.dither:
+      heatramp = scaled * 4 # the dim end, where dithering shows the fraction
+
+   # based on which third of the spectrum we're in, set colors accordingly
+   if temp > 0x80: # hot
+      r = 255; g = 255; b = heatramp
+   elif temp > 0x40: # warmer
+      r = 255; g = heatramp; b = 0
+   else: # coolest
+      r = heatramp; g = 0; b = 0
+
+   loop.set_leds(pixel, r, g, b)
+
+def fire(loop, cooling=50, sparking=120, delay=0.2):
+   """ Create a flame effect where sparks ignite, burn, then cool down as they go up. """
+   # heat array - holds heat of ea. pixel
+   heat = [0 for x in range(0, loop.disp.NUM_LEDS)]
+
+   while True:
+      # Step 1.  Cool down every cell a little
+      for i in range(0, loop.disp.NUM_LEDS):
+         cooldown = loop.random.randint(0, ((cooling * 10) // loop.disp.NUM_LEDS) + 2)
+         if cooldown > heat[i]:
+            heat[i] = 0
+         else:
+            heat[i] = heat[i] - cooldown
+
+      # Step 2.  Heat from each cell drifts 'up' and diffuses a little
+      for k in range(loop.disp.NUM_LEDS - 1, 1, -1):
+         heat[k] = (heat[k - 1] + heat[k - 2] + heat[k - 2]) / 3;
+
+      # Step 3.  Randomly ignite new 'sparks' near the bottom
+      if loop.random.randint(0, 255) < sparking:
+         y = loop.random.randint(0, min(5, loop.disp.NUM_LEDS - 1))
+         heat[y] = heat[y] + loop.random.randint(160, 255)
+
+      # Step 4.  Convert heat to LED colors
+      for x in range(0, loop.disp.NUM_LEDS):
+         _set_pixel_heat_color(loop, x, heat[x])
+
+      loop.strip.show()
+      loop.exitIfDone()
+      loop.wait(delay)
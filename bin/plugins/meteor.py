@@ -0,0 +1,31 @@
+""" Meteor rain. """
+
+def meteorRain(loop, r, g, b, mSize=10, trailDecay=64, mDecay=True, delay=.03):
+   """ A personal favorite: Meteor's with a fiery tail. """
+   loop.all_off() # immediately clear the strip
+   pixels = [[0 for x in range(3)] for y in range(loop.disp.NUM_LEDS)]
+   # a dithering strip shows the tail fading out below one 8 bit step
+   keep = float if loop.strip.dither else int
+
+   while True:
+      for i in range(0, loop.disp.NUM_LEDS*2):
+         # fade brightness of all LEDS by one step
+         for j in range(0, loop.disp.NUM_LEDS):
+            if( mDecay and loop.random.randint(0, 10) > 5):
+               pixels[j][0] = keep(trailDecay/255.0 * pixels[j][0])
+               pixels[j][1] = keep(trailDecay/255.0 * pixels[j][1])
+               pixels[j][2] = keep(trailDecay/255.0 * pixels[j][2])
+               loop.set_leds(j, pixels[j][0], pixels[j][1], pixels[j][2])
+
+         # draw meteor
+         for j in range(0, mSize):
+            mPix = i - j
+            if mPix > -1 and mPix < loop.disp.NUM_LEDS:
+               pixels[mPix][0] = r
+               pixels[mPix][1] = g
+               pixels[mPix][2] = b
+               loop.set_leds(mPix, r, g, b)
+
+         loop.strip.show()
+         loop.exitIfDone()
+         loop.wait(delay)
@@ -0,0 +1,22 @@
+""" Playback of recorded sequences, see sequence.py. """
+
+import sequence
+
+def playback(loop, path):
+   """ Loop a recorded sequence, at the frame rate it was recorded at. """
+   with sequence.Sequence(path) as seq:
+      delay = 1.0 / seq.fps
+      due = loop.clock.time()
+      while True:
+         for x, frame in enumerate(seq):
+            loop.strip.set_buffer(frame)
+            loop.strip.show()
+            del frame # the mapping can't close while a frame points into it
+            if x % 10 == 0: loop.exitIfDone()
+            if loop.sync:
+               loop.wait(delay)
+            else:
+               # fixed rate, so pace against deadlines rather than sleep
+               due += delay
+               loop.clock.sleep(max(0.0, due - loop.clock.time()))
+         loop.exitIfDone()
@@ -0,0 +1,116 @@
+""" Effects that sweep or chase along the strip. """
+
+import math
+
+def drawEye(loop, curLed, r, b, g, eyeSize):
+   """ Helper to draw cylon eye on strip. """
+   # set all black
+   loop.set_leds(None, 0, 0, 0)
+
+   pixels = []
+   pixels.append(curLed)
+   pixels.append(curLed+eyeSize+1)
+   loop.set_leds(pixels, r/10, g/10, b/10)
+
+   pixels = []
+   for i in range(1, eyeSize+1):
+      pixels.append(curLed+i)
+
+   loop.set_leds(pixels, r, g, b)
+   loop.strip.show()
+
+def cylon(loop, r, g, b, eyeSize=4, eyeDelay=0.1, returnDelay=0.5):
+   """ Classic cyclon effect. """
+   while True:
+      loop.exitIfDone() # the sweeps are empty if the eye doesn't fit
+      loop.all_off()
+
+      for x in range(0, loop.disp.NUM_LEDS-eyeSize-2+1):
+         drawEye(loop, x, r, b, g, eyeSize)
+         if x % 10 == 0: loop.exitIfDone()
+         loop.wait(eyeDelay)
+
+      loop.wait(returnDelay)
+
+      for x in range(loop.disp.NUM_LEDS-eyeSize-2, -1, -1):
+         drawEye(loop, x, r, b, g, eyeSize)
+         if x % 10 == 0: loop.exitIfDone()
+         loop.wait(eyeDelay)
+
+      loop.wait(returnDelay)
+
+def running(loop, r, g, b, delay=0.05):
+   while True:
+      pos = 0
+      for x in range(0, loop.disp.NUM_LEDS*2):
+         pos = pos + 1
+         for i in range(0, loop.disp.NUM_LEDS):
+            loop.set_leds(i,
+                          ((math.sin(i+pos)*127+128)/255.0)*r,
+                          ((math.sin(i+pos)*127+128)/255.0)*b,
+                          ((math.sin(i+pos)*127+128)/255.0)*g)
+         loop.strip.show()
+         if x % 10 == 0: loop.exitIfDone()
+         loop.wait(delay)
+
+def colorWipe(loop, r, g, b, delay=0.05):
+   """ Single color wipe of entire strip. """
+   for x in range(0, loop.disp.NUM_LEDS):
+      loop.set_leds(x, r, g, b)
+      loop.strip.show()
+      if x % 10 == 0: loop.exitIfDone()
+      loop.wait(delay)
+
+def wipe(loop, r, g, b, loopDelay=0.05):
+   """ Repeating loop of single color wipe of entire strip, alternating with black. """
+   while True:
+      colorWipe(loop, 0, 0, 0)
+      colorWipe(loop, loop.disp.red, loop.disp.green, loop.disp.blue)
+      loop.exitIfDone()
+      loop.wait(loopDelay)
+
+def rainbowCycle(loop, delay=0.1):
+   """ Rainbow color cycle of entire strip. """
+   y = 1
+   while True:
+      for x in range(0, loop.disp.NUM_LEDS):
+         c = loop.strip.wheel(y)
+         y = (y + 40) % 255
+         loop.set_leds(x, hex=c)
+
+      loop.strip.show()
+      loop.exitIfDone()
+      loop.wait(delay)
+
+def marquee(loop, r, g, b, delay=0.05):
+   """ Go to the movies. """
+   while True:
+      for x in range(0, 3):
+         for i in range(0, loop.disp.NUM_LEDS, 3):
+            loop.set_leds(i+x % 255, r, g, b)
+
+         loop.strip.show()
+         loop.exitIfDone()
+         loop.wait(delay)
+
+         for i in range(0, loop.disp.NUM_LEDS, 3):
+            loop.set_leds(i+x, hex=0)
+         loop.exitIfDone()
+
+def marqueeRainbow(loop, delay=0.05):
+   """ Going to the movies post Y2K. """
+   while True:
+      y = 1
+      for x in range(0, 3):
+         for i in range(0, loop.disp.NUM_LEDS, 3):
+            c = loop.strip.wheel(y)
+            y = (y + 40) % 255
+            loop.set_leds(i+x, hex=c)
+
+         loop.strip.show()
+         loop.exitIfDone()
+         loop.wait(delay)
+
+         for i in range(0, loop.disp.NUM_LEDS, 3):
+            loop.set_leds(i+x, hex=0)
+         loop.exitIfDone()
@@ -0,0 +1,34 @@
+""" Random twinkles and sparkles. """
+
+from effects import randColor
+
+def twinkle(loop, r, g, b, count=10, rand=False, loopDelay=0.3):
+   """ Twinkle, twinkle, little star. """
+   while True:
+      loop.set_leds(None, 0, 0, 0)
+      for x in range(0, count):
+         pixel = loop.random.randint(0, loop.disp.NUM_LEDS)
+         if rand:
+            loop.set_leds(pixel, randColor(loop.random),
+                          randColor(loop.random), randColor(loop.random))
+         else:
+            loop.set_leds(pixel, r, g, b)
+         loop.strip.show()
+         loop.wait(loopDelay)
+
+      loop.exitIfDone()
+      loop.wait(loopDelay)
+
+def snow(loop):
+   """ Opposite of twinkle. Flicker snow effect. """
+   while True:
+      # make it white, then sleep
+      loop.set_leds(None, 255, 255, 255)
+      loop.strip.show()
+      loop.wait(loop.random.randint(300, 1000)/1000.0)
+      # blink one pixel
+      pixel = loop.random.randint(0, loop.disp.NUM_LEDS)
+      loop.set_leds(pixel, 16, 16, 16)
+      loop.strip.show()
+      loop.wait(0.02)
+      loop.exitIfDone()
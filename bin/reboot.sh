@@ -1,6 +1,7 @@
 #!/bin/bash
 
-sleep 30
+# no sleep here - control-mqtt.py restores the last state right away and
+# waits mqttDelay seconds for the network itself before connecting
 
 cd "$(dirname "$0")";
 ./control-mqtt.py &
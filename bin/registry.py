@@ -0,0 +1,144 @@
+"""
+Effect registry - every effect by name, the parameters it takes and the
+plugin module it lives in.
+
+Parameters come in with the MQTT message that starts the effect, as
+{"effect": "fire", "args": {"cooling": 100}}. They are checked against the
+declarations here once, when the effect is started: unknown names are
+dropped, values are converted to the declared type and clamped to its
+bounds, and anything that can't be converted falls back to the default.
+Effects whose sizes have to fit on the strip are then fitted to its length.
+
+Plugin modules are only imported when one of their effects is started, so
+a strip only ever loads the code of the effects it actually runs.
+"""
+
+import importlib
+
+class Param:
+   """ Declaration of one effect parameter. """
+
+   def check(self, value):
+      """ Value converted to our type and clamped to our bounds. """
+      try:
+         if self.type is bool and isinstance(value, str):
+            value = value.lower() in ('1', 'true', 'yes', 'on')
+         value = self.type(value)
+      except (TypeError, ValueError, OverflowError):
+         return self.default
+      if self.low is not None:
+         value = max(self.low, value)
+      if self.high is not None:
+         value = min(self.high, value)
+      return value
+
+   def __init__(self, default, low=None, high=None):
+      """ The type of the parameter is the type of its default. """
+      self.default = default
+      self.type = type(default)
+      self.low = low
+      self.high = high
+
+class Effect:
+   """ A registered effect. """
+
+   def check(self, args, num_led=None):
+      """ Full set of keyword arguments for the effect, from the args given,
+      fitted to a strip of num_led LEDs if that is known.
+      """
+      if not isinstance(args, dict):
+         args = {}
+      kwargs = dict(self.fixed)
+      for name, param in self.params.items():
+         kwargs[name] = param.check(args[name]) if name in args else param.default
+      if self.fit is not None and num_led is not None:
+         self.fit(kwargs, num_led)
+      return kwargs
+
+   def run(self, loop, kwargs):
+      """ Import the effect and run it on loop, with checked kwargs. """
+      module = importlib.import_module('plugins.' + self.module)
+      function = getattr(module, self.function)
+      if self.color:
+         function(loop, loop.disp.red, loop.disp.green, loop.disp.blue, **kwargs)
+      else:
+         function(loop, **kwargs)
+      return
+
+   def __init__(self, module, function, color=False, fixed=None, fit=None, **params):
+      """ module   - plugin module, under plugins/
+          function - effect function in it
+          color    - pass the display's color as r, g, b
+          fixed    - keyword arguments that can't be changed over MQTT
+          fit      - fit(kwargs, num_led) shrinks sizes to the strip, in place
+          params   - tunable keyword arguments, as Param declarations
+      """
+      self.module = module
+      self.function = function
+      self.color = color
+      self.fixed = fixed or {}
+      self.fit = fit
+      self.params = params
+
+def fitEye(kwargs, num_led):
+   """ The cylon eye plus its two dim edges has to fit on the strip. """
+   kwargs['eyeSize'] = max(1, min(kwargs['eyeSize'], num_led - 2))
+
+def fitEyes(kwargs, num_led):
+   """ Both halloween eyes and the space between them have to fit on the strip. """
+   kwargs['eyeWidth'] = max(1, min(kwargs['eyeWidth'], num_led // 2))
+   kwargs['eyeSpace'] = max(0, min(kwargs['eyeSpace'], num_led - 2 * kwargs['eyeWidth']))
+
+EFFECTS = {
+   'fadeInOut': Effect('fades', 'fadeInOut', color=True,
+                       steps=Param(128, 1, 255), fadeDelay=Param(0.01, 0.0, 1.0),
+                       loopDelay=Param(0.1, 0.0, 10.0)),
+   'halloweenEyes': Effect('fades', 'halloweenEyes', color=True, fit=fitEyes,
+                           eyeWidth=Param(1, 1, 10), eyeSpace=Param(4, 0, 50),
+                           fade=Param(True), steps=Param(50, 1, 255),
+                           fadeDelay=Param(0.01, 0.0, 1.0),
+                           loopDelay=Param(0.1, 0.0, 10.0)),
+   'cylon': Effect('scanners', 'cylon', color=True, fit=fitEye,
+                   eyeSize=Param(4, 1, 50), eyeDelay=Param(0.04, 0.0, 1.0),
+                   returnDelay=Param(0.2, 0.0, 10.0)),
+   'twinkle': Effect('sparkles', 'twinkle', color=True,
+                     count=Param(10, 1, 100), loopDelay=Param(0.3, 0.0, 10.0)),
+   'randomTwinkle': Effect('sparkles', 'twinkle',
+                           fixed={'r': 0, 'g': 0, 'b': 0, 'rand': True},
+                           count=Param(10, 1, 100), loopDelay=Param(0.3, 0.0, 10.0)),
+   'sparkle': Effect('sparkles', 'twinkle', color=True,
+                     count=Param(1, 1, 100), loopDelay=Param(0.0, 0.0, 10.0)),
+   'randomSparkle': Effect('sparkles', 'twinkle',
+                           fixed={'r': 0, 'g': 0, 'b': 0, 'rand': True},
+                           count=Param(1, 1, 100), loopDelay=Param(0.0, 0.0, 10.0)),
+   'snowSparkle': Effect('sparkles', 'snow'),
+   'running': Effect('scanners', 'running', color=True,
+                     delay=Param(0.05, 0.0, 1.0)),
+   'colorWipe': Effect('scanners', 'wipe', color=True,
+                       loopDelay=Param(0.05, 0.0, 10.0)),
+   'rainbowCycle': Effect('scanners', 'rainbowCycle',
+                          delay=Param(0.1, 0.0, 1.0)),
+   'marquee': Effect('scanners', 'marquee', color=True,
+                     delay=Param(0.05, 0.0, 1.0)),
+   'marqueeRainbow': Effect('scanners', 'marqueeRainbow',
+                            delay=Param(0.05, 0.0, 1.0)),
+   'fire': Effect('fire', 'fire',
+                  cooling=Param(150, 0, 255), sparking=Param(120, 0, 255),
+                  delay=Param(0.03, 0.0, 1.0)),
+   'bouncing': Effect('bouncing', 'bouncing', fixed={'rand': False},
+                      balls=Param(1, 1, 10), delay=Param(0.05, 0.0, 1.0)),
+   'bouncingRainbow': Effect('bouncing', 'bouncing', fixed={'rand': True},
+                             balls=Param(4, 1, 10), delay=Param(0.05, 0.0, 1.0)),
+   'meteorRain': Effect('meteor', 'meteorRain', color=True,
+                        mSize=Param(10, 1, 100), trailDecay=Param(64, 0, 255),
+                        mDecay=Param(True), delay=Param(0.03, 0.0, 1.0)),
+}
+
+def get(name):
+   """ The registered effect called name, or None. """
+   return EFFECTS.get(name)
+
+def check(name, args, num_led=None):
+   """ Checked keyword arguments for effect name, {} if it isn't registered. """
+   effect = get(name)
+   return effect.check(args, num_led) if effect is not None else {}
@@ -0,0 +1,95 @@
+"""
+Scenes Class - named presets of static looks, stored on the device.
+
+A scene is a list of runs, each one color over a range of LEDs:
+
+   [{"color": {"r": 255, "g": 0, "b": 0}, "start": 0, "end": 10, "step": 1}, ...]
+
+start defaults to 0, end to the end of the strip and step to 1, so
+[{"color": red, "step": 2}, {"color": green, "start": 1, "step": 2}]
+alternates red and green over the whole strip. Later runs paint over
+earlier ones.
+
+Scenes come from [scene <name>] sections in config.ini (key 'runs') or are
+defined over MQTT, in which case they are saved in a file so they survive
+a reboot. Recalling one uses a ready made frame buffer: every scene is
+drawn once for the strip's length, brightness and color order and kept in
+a small cache, which is dropped as soon as any of those change.
+"""
+
+import collections
+import apa102
+
+class Scenes:
+   """ Scene definitions plus a bounded cache of their compiled frames. """
+
+   def define(self, name, runs, save=True):
+      """ Add or replace a scene. Raises ValueError if runs isn't usable. """
+      try:
+         for run in runs:
+            [int(run.get(k, 0)) for k in ('start', 'end', 'step')]
+            [int(run.get('color', {}).get(c, 0)) for c in 'rgb']
+      except (AttributeError, TypeError, ValueError, OverflowError):
+         raise ValueError('scene {0} needs a list of runs'.format(name))
+      self.defs[name] = runs
+      self.cache.pop(name, None)
+      if save and self.store is not None:
+         self.saved[name] = runs
+         self.store.save(dict(self.saved))
+      return
+
+   def compile(self, name, strip, brightness):
+      """ Draw scene name the way Control.set_leds would draw it on strip.
+      Returns the frame buffer and the list of LEDs it lights.
+      """
+      canvas = apa102.APA102(strip.num_led, strip.global_brightness,
+                             spi=apa102.NullSPI())
+      canvas.rgb = strip.rgb
+      lit = [0] * strip.num_led
+      for run in self.defs[name]:
+         color = run.get('color', {})
+         hexcolor = canvas.combine_color(*[max(0, min(int(color.get(c, 0)), 255))
+                                           for c in 'rgb'])
+         start = max(0, int(run.get('start', 0)))
+         end = min(strip.num_led, int(run.get('end', strip.num_led)))
+         for x in range(start, end, max(1, int(run.get('step', 1)))):
+            canvas.set_pixel_rgb(x, hexcolor, brightness)
+            lit[x] = 1 if hexcolor else 0
+      return bytes(canvas.leds), lit
+
+   def frame(self, name, strip, brightness):
+      """ Compiled (frame, lit) of scene name for strip, or None if unknown. """
+      if name not in self.defs:
+         return None
+
+      key = (strip.num_led, strip.global_brightness, tuple(strip.rgb), brightness)
+      if key != self.key:
+         self.cache.clear() # length, brightness or color order changed
+         self.key = key
+
+      if name in self.cache:
+         self.cache.move_to_end(name)
+      else:
+         self.cache[name] = self.compile(name, strip, brightness)
+         if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+      return self.cache[name]
+
+   def __init__(self, store=None, size=8):
+      """ store - persist.StateStore for scenes defined over MQTT
+          size  - number of compiled scenes to keep
+      """
+      self.defs = {}
+      self.saved = {}
+      self.store = store
+      self.size = size
+      self.cache = collections.OrderedDict()
+      self.key = None
+
+      saved = store.load() if store is not None else None
+      for name, runs in (saved or {}).items():
+         try:
+            self.define(name, runs, save=False)
+            self.saved[name] = runs
+         except ValueError:
+            pass # leave a broken entry out rather than not starting
@@ -0,0 +1,253 @@
+#!/usr/bin/python3
+"""
+Recording and playback of pre-designed light shows.
+
+A sequence file is a header followed by frames at a fixed rate. Each frame
+is the APA102 pixel buffer as it goes out to the strip (4 bytes per LED,
+brightness byte first, colors in strip order), so playback is a plain copy
+into APA102.leds.
+
+   header  - magic, version, flags, LEDs, fps, frame count, index offset
+   frames  - raw: fixed size, 4 * LEDs bytes each
+             delta: each frame XORed with the one before it and run length
+             encoded; an index of frame offsets follows the last frame
+
+Delta RLE is a run of tokens: a byte c < 0x80 followed by c + 1 literal
+bytes, or a byte c >= 0x80 standing for c - 0x7F zero bytes. Unchanged
+pixels XOR to zero, so slow shows shrink a lot.
+
+Usage:
+   sequence.py record <effect> <out.seq> <leds> <seconds> [fps] [delta]
+   sequence.py import <rgb file> <out.seq> <leds> [fps] [delta]
+   sequence.py info <file.seq>
+"""
+
+import mmap, os, re, struct, sys, time
+
+MAGIC = b'APAS'
+VERSION = 1
+FLAG_DELTA = 0x01
+HEADER = struct.Struct('<4sBBHHII')
+INDEX = struct.Struct('<I')
+EXTENSION = '.seq'
+
+ZEROS = re.compile(b'\x00+')
+
+def find(folder, name):
+   """ Path of the sequence called name in folder, or None if there isn't one. """
+   if not folder or not name or os.path.basename(name) != name:
+      return None # no paths from MQTT payloads
+   path = os.path.join(folder, name + EXTENSION)
+   return path if os.path.isfile(path) else None
+
+def xor(a, b):
+   """ XOR two equal sized frames. """
+   n = int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')
+   return n.to_bytes(len(a), 'little')
+
+def encode(delta):
+   """ Run length encode a delta frame. """
+   out = bytearray()
+   pos = 0
+   for run in ZEROS.finditer(delta):
+      start, end = run.span()
+      if end - start < 2 and end != len(delta):
+         continue # a lone zero is cheaper as a literal
+      for x in range(pos, start, 0x80):
+         chunk = delta[x:min(x + 0x80, start)]
+         out.append(len(chunk) - 1)
+         out += chunk
+      for x in range(start, end, 0x80):
+         out.append(0x7F + min(0x80, end - x))
+      pos = end
+   for x in range(pos, len(delta), 0x80):
+      chunk = delta[x:x + 0x80]
+      out.append(len(chunk) - 1)
+      out += chunk
+   return bytes(out)
+
+def decode(data, size):
+   """ Expand a run length encoded delta frame. """
+   out = bytearray(size)
+   pos = i = 0
+   while i < len(data):
+      c = data[i]
+      if c < 0x80:
+         out[pos:pos + c + 1] = data[i + 1:i + c + 2]
+         pos += c + 1
+         i += c + 2
+      else:
+         pos += c - 0x7F
+         i += 1
+   return out
+
+class Recorder:
+   """ Writes frames to a sequence file. """
+
+   def add(self, leds):
+      """ Append one frame; leds is an APA102 pixel buffer (strip.leds). """
+      frame = bytes(leds)
+      if len(frame) != self.size:
+         raise ValueError('frame is {0} bytes, expected {1}'.format(len(frame), self.size))
+
+      if self.delta:
+         self.index.append(self.written)
+         frame, self.prev = encode(xor(frame, self.prev)), frame
+      self.file.write(frame)
+      self.written += len(frame)
+      self.frames += 1
+      return
+
+   def capture(self, strip, seconds, event=None):
+      """ Sample strip's pixel buffer at our frame rate, while something else
+      (an effect thread, usually) draws into it. Stops early if event is set.
+      """
+      delay = 1.0 / self.fps
+      due = time.monotonic()
+      for _ in range(int(seconds * self.fps)):
+         if event is not None and event.is_set():
+            break
+         self.add(strip.leds)
+         due += delay
+         time.sleep(max(0.0, due - time.monotonic()))
+      return
+
+   def close(self):
+      """ Write the index and the final header. """
+      index = 0
+      if self.delta:
+         self.index.append(self.written)
+         index = HEADER.size + self.written
+         for offset in self.index:
+            self.file.write(INDEX.pack(offset))
+      self.file.seek(0)
+      self.file.write(HEADER.pack(MAGIC, VERSION, FLAG_DELTA if self.delta else 0,
+                                  self.num_led, self.fps, self.frames, index))
+      self.file.close()
+      return
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *args):
+      self.close()
+
+   def __init__(self, path, num_led, fps=30, delta=False):
+      """ path - file to create, num_led - frame size in LEDs,
+          fps - playback rate, delta - delta/RLE compress the frames.
+      """
+      self.num_led = num_led
+      self.size = 4 * num_led
+      self.fps = fps
+      self.delta = delta
+      self.frames = 0
+      self.written = 0
+      self.index = []
+      self.prev = bytes(self.size)
+      self.file = open(path, 'wb')
+      self.file.write(bytes(HEADER.size)) # filled in by close()
+
+class Sequence:
+   """ Memory mapped sequence file, for playback. """
+
+   def __len__(self):
+      return self.frames
+
+   def __iter__(self):
+      """ Frames in order, each one ready for APA102.set_buffer(). """
+      if not self.delta:
+         for i in range(self.frames):
+            start = HEADER.size + i * self.size
+            yield self.view[start:start + self.size]
+         return
+
+      frame = bytes(self.size)
+      start = INDEX.unpack_from(self.map, self.index)[0]
+      for i in range(self.frames):
+         end = INDEX.unpack_from(self.map, self.index + (i + 1) * INDEX.size)[0]
+         delta = decode(self.view[HEADER.size + start:HEADER.size + end], self.size)
+         frame = xor(frame, delta)
+         yield frame
+         start = end
+
+   def close(self):
+      """ Unmap and close the file. """
+      self.view.release()
+      self.map.close()
+      self.file.close()
+      return
+
+   def __enter__(self):
+      return self
+
+   def __exit__(self, *args):
+      self.close()
+
+   def __init__(self, path):
+      """ Open and map the sequence at path. """
+      self.file = open(path, 'rb')
+      self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+      self.view = memoryview(self.map)
+      (magic, version, flags, self.num_led, self.fps, self.frames,
+       self.index) = HEADER.unpack_from(self.map)
+      if magic != MAGIC or version != VERSION:
+         self.close()
+         raise ValueError('{0} is not a sequence file'.format(path))
+      self.size = 4 * self.num_led
+      self.delta = bool(flags & FLAG_DELTA)
+
+def record(effect, path, leds, seconds, fps=30, delta=False):
+   """ Run one of the built-in effects off the strip and record it. """
+   import importlib, apa102, registry
+   control = importlib.import_module('control-mqtt')
+
+   strip = apa102.APA102(num_led=leds, global_brightness=15, order='rgb', spi=apa102.NullSPI())
+   disp = control.Control(leds, strip=strip)
+   disp.effect = effect
+   disp.args = registry.check(effect, {}, leds)
+   disp.start_effect()
+
+   with Recorder(path, leds, fps, delta) as rec:
+      try:
+         rec.capture(strip, seconds)
+      finally:
+         disp.stop_effect(fade=0)
+   return
+
+def convert(source, path, leds, fps=30, delta=False):
+   """ Turn a file of raw RGB frames (3 bytes per LED) into a sequence. """
+   import apa102
+   strip = apa102.APA102(num_led=leds, global_brightness=31, order='rgb', spi=apa102.NullSPI())
+
+   with open(source, 'rb') as f, Recorder(path, leds, fps, delta) as rec:
+      while True:
+         rgb = f.read(3 * leds)
+         if len(rgb) < 3 * leds:
+            break
+         for x in range(leds):
+            strip.set_pixel(x, rgb[3 * x], rgb[3 * x + 1], rgb[3 * x + 2])
+         rec.add(strip.leds)
+   return
+
+def main():
+   """ Entry point. """
+   args = sys.argv[1:]
+   delta = 'delta' in args
+   args = [a for a in args if a != 'delta']
+
+   if len(args) >= 5 and args[0] == 'record':
+      record(args[1], args[2], int(args[3]), float(args[4]),
+             int(args[5]) if len(args) > 5 else 30, delta)
+   elif len(args) >= 4 and args[0] == 'import':
+      convert(args[1], args[2], int(args[3]),
+              int(args[4]) if len(args) > 4 else 30, delta)
+   elif len(args) == 2 and args[0] == 'info':
+      with Sequence(args[1]) as seq:
+         print('{0} LEDs, {1} frames at {2} fps, {3}'.format(
+               seq.num_led, len(seq), seq.fps, 'delta' if seq.delta else 'raw'))
+   else:
+      print(__doc__)
+   return
+
+if __name__ == '__main__':
+   main()
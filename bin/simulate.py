@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+"""
+Deterministic effect simulator, for checking that a change to an effect (or
+to anything it draws through) still produces exactly the same frames.
+
+Each effect is run off the strip: on a virtual clock whose sleep() returns
+at once, with its random numbers seeded, and against a transport that
+captures the frames show() sends out instead of clocking them to the LEDs.
+That makes every run repeatable, and fast. A run is boiled down to one
+hash per frame, for every registered effect and every strip length given.
+
+Usage:
+   simulate.py record <golden.json> [frames] [lengths]
+   simulate.py compare <golden.json>
+
+lengths is a comma separated list of strip lengths. record writes the golden
+hashes; compare runs everything again with the same settings and reports
+the first frame that differs, exiting with 1 if anything does.
+"""
+
+import hashlib, importlib, json, sys, threading, time
+import apa102, registry
+
+FRAMES = 100
+LENGTHS = [1, 8, 24, 60, 144, 300]
+SEED = 1
+COLOR = (255, 128, 16)
+""" Defaults for the simulation runs. """
+
+class Done(Exception):
+   """ Raised by the clock to end a run that stopped producing frames. """
+
+class SimClock:
+   """ Virtual clock: sleep() moves the time forward and returns at once. """
+
+   def time(self):
+      return self.now
+
+   def sleep(self, delay):
+      self.now += delay
+      if self.now > self.limit:
+         raise Done()
+
+   def __init__(self, start=1000000.0, limit=3600.0):
+      """ start - initial time, limit - virtual seconds a run may take. """
+      self.now = start
+      self.limit = start + limit
+
+class CaptureSPI:
+   """ Transport that keeps a hash of every frame sent, and asks the effect
+   to stop once it has enough of them.
+   """
+
+   def write(self, data):
+      # start and end frames are all zeroes; LED frames begin with 0b111
+      if len(data) == self.size and data[0] & 0xE0 == 0xE0:
+         self.hashes.append(hashlib.sha1(bytes(data)).hexdigest()[:16])
+         if len(self.hashes) >= self.frames:
+            self.done.set()
+
+   def close(self):
+      return
+
+   def __init__(self, num_led, frames):
+      self.size = 4 * num_led
+      self.frames = frames
+      self.hashes = []
+      self.done = threading.Event()
+
+class LogSPI:
+   """ Transport that logs the wall clock time and hash of every frame sent,
+   one line each, for comparing controllers that run side by side (see
+   fleet.py).
+   """
+
+   def write(self, data):
+      if len(data) == self.size and data[0] & 0xE0 == 0xE0:
+         self.file.write('{0:.4f} {1}\n'.format(time.time(),
+                         hashlib.sha1(bytes(data)).hexdigest()[:16]))
+         self.file.flush()
+
+   def close(self):
+      self.file.close()
+
+   def __init__(self, path, num_led):
+      self.size = 4 * num_led
+      self.file = open(path, 'w')
+
+def simulate(name, num_led, frames=FRAMES, seed=SEED, color=COLOR):
+   """ Run effect name on a strip of num_led LEDs; returns the frame hashes. """
+   import effects
+   control = importlib.import_module('control-mqtt')
+
+   spi = CaptureSPI(num_led, frames)
+   disp = control.Control(num_led, strip=apa102.APA102(num_led, 15, spi=spi))
+   disp.red, disp.green, disp.blue = color
+   disp.effect = name
+   disp.args = registry.check(name, {}, num_led)
+   del spi.hashes[:] # drop the frame shown by Control itself
+
+   loop = effects.EffectLoop(disp=disp, strip=disp.mixer.layer(),
+                             clock=SimClock(), seed=seed)
+   error = []
+   try:
+      loop.loop(spi.done)
+   except (SystemExit, Done):
+      pass # exitIfDone() or the clock stopped it
+   except Exception as e:
+      error.append('error: ' + type(e).__name__) # crashing is an outcome too
+   return spi.hashes[:frames] + error
+
+def run(frames, lengths, seed=SEED, color=COLOR):
+   """ Simulate every registered effect at every length. """
+   results = {}
+   for name in sorted(registry.EFFECTS):
+      results[name] = {}
+      for num_led in lengths:
+         results[name][str(num_led)] = simulate(name, num_led, frames, seed, color)
+   return {'frames': frames, 'lengths': lengths, 'seed': seed,
+           'color': list(color), 'results': results}
+
+def compare(golden, current):
+   """ Differences between two runs, as a list of messages. """
+   problems = []
+   for name, lengths in golden['results'].items():
+      for num_led, hashes in lengths.items():
+         got = current['results'].get(name, {}).get(num_led)
+         if got is None:
+            problems.append('{0} @ {1} LEDs: missing'.format(name, num_led))
+            continue
+         for x, (want, have) in enumerate(zip(hashes, got)):
+            if want != have:
+               problems.append('{0} @ {1} LEDs: frame {2} differs'.format(name, num_led, x))
+               break
+         else:
+            if len(hashes) != len(got):
+               problems.append('{0} @ {1} LEDs: {2} frames, expected {3}'.format(
+                               name, num_led, len(got), len(hashes)))
+   return problems
+
+def main():
+   """ Entry point. """
+   args = sys.argv[1:]
+
+   if len(args) >= 2 and args[0] == 'record':
+      frames = int(args[2]) if len(args) > 2 else FRAMES
+      lengths = [int(n) for n in args[3].split(',')] if len(args) > 3 else LENGTHS
+      with open(args[1], 'w') as f:
+         json.dump(run(frames, lengths), f, indent=1)
+
+   elif len(args) == 2 and args[0] == 'compare':
+      with open(args[1]) as f:
+         golden = json.load(f)
+      current = run(golden['frames'], golden['lengths'], golden['seed'],
+                    tuple(golden['color']))
+      problems = compare(golden, current)
+      for problem in problems:
+         print(problem)
+      print('{0} differences'.format(len(problems)))
+      sys.exit(1 if problems else 0)
+
+   else:
+      print(__doc__)
+   return
+
+if __name__ == '__main__':
+   main()
@@ -0,0 +1,103 @@
+"""
+StatusPublisher Class - report our state over MQTT without flooding the broker.
+
+Nothing is sent unless a field actually changed, and publishes are spaced at
+least interval seconds apart: a burst of slider messages coalesces into one
+publish at the end of each interval. Each field is kept serialized on its
+own, so a change only serializes the field that changed, and the status
+is published as is with the client's publish() rather than handed to
+mymqtt's update() to be serialized again.
+
+With delta on, the publishes during a burst carry just the changed fields
+(and 'state', which Home Assistant wants in every message) and are not
+retained. Once things have been quiet for an interval, one full retained
+status goes out, so new subscribers still get the whole picture. A change
+on its own, outside a burst, goes out as the full retained status right
+away.
+"""
+
+import json, threading, time
+
+class StatusPublisher:
+   """ Change-only, rate limited status publishing. """
+
+   def update(self, **fields):
+      """ Merge fields into the status; publish if anything changed. """
+      with self.lock:
+         for key, value in fields.items():
+            if key in self.fields and self.fields[key] == value:
+               continue
+            self.fields[key] = value
+            self.fragments[key] = '"{0}":{1}'.format(key, json.dumps(value, separators=(',', ':')))
+            self.dirty.add(key)
+         if not self.dirty or self.timer is not None:
+            return # nothing new, or a publish is already on its way
+         wait = self.last + self.interval - time.monotonic()
+         if wait > 0:
+            self.timer = self.schedule(wait, self.flush)
+            return
+      self.flush(burst=False)
+      return
+
+   def flush(self, burst=True):
+      """ Publish whatever changed since the last publish. burst is False
+      when nothing was published for an interval before the change.
+      """
+      with self.lock:
+         self.timer = None
+         if not self.dirty:
+            return
+         if self.delta and burst:
+            keys = self.dirty | {'state'}
+            self.send([self.fragments[key] for key in keys if key in self.fragments], False)
+            self.stale = True
+            if self.settler is not None:
+               self.settler.cancel()
+            self.settler = self.schedule(self.interval, self.settle)
+         else:
+            self.send(self.fragments.values(), True)
+            self.stale = False
+         self.dirty.clear()
+         self.last = time.monotonic()
+      return
+
+   def settle(self):
+      """ After a burst of deltas, publish the full retained status. """
+      with self.lock:
+         self.settler = None
+         if self.stale and not self.dirty:
+            self.send(self.fragments.values(), True)
+            self.stale = False
+      return
+
+   def send(self, fragments, retain):
+      """ Publish the fragments as one JSON object. """
+      self.client.publish(self.topic, '{' + ','.join(fragments) + '}', retain=retain)
+      return
+
+   @staticmethod
+   def schedule(delay, function):
+      """ Run function after delay seconds, on a timer thread. """
+      timer = threading.Timer(delay, function)
+      timer.daemon = True
+      timer.start()
+      return timer
+
+   def __init__(self, client, topic, interval=0.5, delta=False):
+      """ client   - mymqtt client to publish with (paho's publish())
+          topic    - state topic to publish on
+          interval - minimum seconds between publishes
+          delta    - publish only changed fields during bursts
+      """
+      self.client = client
+      self.topic = topic
+      self.interval = interval
+      self.delta = delta
+      self.fields = {}
+      self.fragments = {}
+      self.dirty = set()
+      self.stale = False
+      self.last = 0.0
+      self.timer = None
+      self.settler = None
+      self.lock = threading.Lock()
@@ -0,0 +1,61 @@
+"""
+TimeBase Class - a clock shared by every controller in the fleet.
+
+Shared time is the local monotonic clock plus an offset. Until we hear from
+anyone the offset is taken from the (NTP synced) wall clock. Messages that
+carry a 'ts' field, seconds since the epoch on the sender's clock, calibrate
+it: the message took a little while to get here, so ts - monotonic() is a
+lower bound for the offset and the largest of the recent samples is the best
+estimate. One sample is only off by its own delivery time, which the wall
+clock usually beats, so the wall clock is kept until MIN_SAMPLES have come
+in. From then on hosts agree to within the spread of their fastest
+deliveries - a few ms on one broker, provided whoever sends the effects
+also sends 'ts' pings every few seconds.
+"""
+
+import collections, math, time
+
+SYNC_LEAD = 0.25
+""" Seconds between a message's ts and the shared start of its effect. """
+
+MIN_SAMPLES = 4
+""" Timestamps needed before they are trusted over the wall clock. """
+
+def seconds(value):
+   """ value as a float if it is a usable time in seconds, else None. """
+   if isinstance(value, bool) or not isinstance(value, (int, float)):
+      return None
+   value = float(value)
+   return value if math.isfinite(value) else None
+
+class TimeBase:
+   """ Monotonic clock calibrated against sender timestamps. """
+
+   def now(self):
+      """ Shared time, in seconds since the epoch. """
+      return time.monotonic() + self.offset
+
+   def calibrate(self, ts):
+      """ Adjust the offset with the sender timestamp of a message just received. """
+      self.samples.append(float(ts) - time.monotonic())
+      if len(self.samples) >= MIN_SAMPLES:
+         self.offset = max(self.samples)
+      else:
+         self.offset = time.time() - time.monotonic()
+      return
+
+   def epoch(self, ts=None, quantum=1.0):
+      """ Shared start time for an effect.
+
+            ts - sender timestamp of the message starting it. Every host
+                 gets the same ts, so every host picks the same start.
+                 Without one, round up to the next multiple of quantum.
+      """
+      if ts is not None:
+         return float(ts) + SYNC_LEAD
+      return math.ceil(self.now() / quantum) * quantum
+
+   def __init__(self, window=16):
+      """ window - number of timestamp samples to keep. """
+      self.samples = collections.deque(maxlen=window)
+      self.offset = time.time() - time.monotonic()